@@ -91,9 +91,13 @@ def is_platform_supported():
     return get_current_arch() is not None
 
 
-def construct(buildfile, targets=()):
+def construct(buildfile, targets=(), incremental=False, concurrency=1):
     """Construct the given buildfile.
 
+    When incremental is True, tasks whose inputs did not change since
+    their last run are skipped. When concurrency is larger than one,
+    targets that do not depend upon each other are run in parallel.
+
     Raise task error if something goes wrong.
     """
     # Ensure file:
@@ -111,7 +115,7 @@ def construct(buildfile, targets=()):
     if not project:
         raise TaskError("No project loaded")
 
-    runner = TaskRunner()
+    runner = TaskRunner(concurrency=concurrency, incremental=incremental)
     runner.run(project, list(targets))
 
 
@@ -425,7 +429,9 @@ def c3c(
     """
     reporter = get_reporter(reporter)
     march = get_arch(march)
-    ir_module = c3_to_ir(sources, includes, march, reporter=reporter)
+    ir_module = c3_to_ir(
+        sources, includes, march, reporter=reporter, debug=debug
+    )
 
     optimize(ir_module, level=opt_level, reporter=reporter)
 
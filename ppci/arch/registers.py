@@ -1,7 +1,7 @@
 class Register:
     """ Baseclass of all registers types """
 
-    # TODO: __slots__ = ('name', '_num', '_color')
+    __slots__ = ("name", "_num", "_color", "_real", "aliases", "aka")
 
     @classmethod
     def all_registers(cls):
@@ -21,6 +21,7 @@ class Register:
             self._color = num
 
         self._num = num
+        self._real = None
 
         # If this register interferes with another register:
         self.aliases = aliases
@@ -29,7 +30,7 @@ class Register:
     def __repr__(self):
         if self._num is None:
             if self.is_colored:
-                reg = self.from_num(self.color)
+                reg = self.get_real()
             else:
                 reg = "-"
             return "{}[{}]".format(self.name, reg)
@@ -39,7 +40,7 @@ class Register:
     def __str__(self):
         if self._num is None:
             if self.is_colored:
-                return self.from_num(self.color).name
+                return self.get_real().name
             else:
                 return self.name
         else:
@@ -48,10 +49,13 @@ class Register:
     def get_real(self):
         """Retrieve the real hardware register.
 
-        If this is a virtual register, return it's num.
+        If this is a virtual register, return it's num. The looked up
+        register is cached until the register is colored again.
         """
         if self._num is None:
-            return self.from_num(self._color)
+            if self._real is None:
+                self._real = self.from_num(self._color)
+            return self._real
         else:
             return self
 
@@ -77,6 +81,7 @@ class Register:
 
     def set_color(self, color):
         self._color = color
+        self._real = None
 
     @property
     def is_colored(self):
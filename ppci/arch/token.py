@@ -43,16 +43,41 @@ class _p2(property):
         return bit_concat(self, other)
 
 
-def bit_range(b, e, signed=False):
-    """ Create a property which sets a bit range """
-
-    def getter(s):
-        return s[b:e]
+class _BitRange(_p2):
+    """ A field which maps directly onto a range of bits of a token.
+
+    The shift and mask are determined once when the field is created,
+    so that getting and setting the field is a single shift and mask
+    operation on the token's bit value.
+    """
+
+    def __init__(self, b, e, signed):
+        super().__init__(None, None, e - b, signed)
+        self._shift = b
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return (instance.bit_value >> self._shift) & self._mask
+
+    def __set__(self, instance, value):
+        mask = self._mask
+        # Negative values are wrapped around as two's complement:
+        if value > mask or value < -(mask + 1):
+            raise ValueError(
+                "value {} cannot be fit into {} bits".format(
+                    value, self._bitsize
+                )
+            )
+        shift = self._shift
+        instance.bit_value = (instance.bit_value & ~(mask << shift)) | (
+            (value & mask) << shift
+        )
 
-    def setter(s, v):
-        s[b:e] = v
 
-    return _p2(getter, setter, e - b, signed)
+def bit_range(b, e, signed=False):
+    """ Create a property which sets a bit range """
+    return _BitRange(b, e, signed)
 
 
 def bit(b):
@@ -80,6 +105,9 @@ def bit_concat(*partials):
     return _p2(getter, setter, bitsize, signed)
 
 
+_BYTE_ORDERS = {Endianness.LITTLE: "little", Endianness.BIG: "big"}
+
+
 class TokenMeta(type):
     def __init__(cls, name, bases, attrs):
         super(TokenMeta, cls).__init__(name, bases, attrs)
@@ -182,11 +210,8 @@ class Token(metaclass=TokenMeta):
         """ Pack integer value into bytes """
         assert cls.Info.size is not None
         size = cls.Info.size // 8
-        if cls.Info.endianness == Endianness.LITTLE:
-            byte_numbers = range(size)
-        else:
-            byte_numbers = reversed(range(size))
-        return bytes((value >> (x * 8)) & 0xFF for x in byte_numbers)
+        value &= (1 << cls.Info.size) - 1
+        return value.to_bytes(size, _BYTE_ORDERS[cls.Info.endianness])
 
     @classmethod
     def unpack(cls, data):
@@ -194,13 +219,7 @@ class Token(metaclass=TokenMeta):
         byte_size = cls.Info.size // 8
         if len(data) != byte_size:
             raise TypeError("Incorrect amount of data provided")
-        value = 0
-        if cls.Info.endianness == Endianness.LITTLE:
-            data = reversed(data)
-        for byte in data:
-            value <<= 8
-            value += byte
-        return value
+        return int.from_bytes(data, _BYTE_ORDERS[cls.Info.endianness])
 
 
 class TokenSequence:
@@ -4,9 +4,35 @@ from ..registers import Register, RegisterClass
 from ... import ir
 
 
-class Register64(Register):
+class X86Register(Register):
+    """ A register which is encoded in the rex prefix and modrm byte.
+
+    The rex bit and the lower three register bits are determined once the
+    register number is known, either at creation or when it is colored.
+    """
+
+    __slots__ = ("rexbit", "regbits")
+
+    def __init__(self, name, num=None, aliases=(), aka=()):
+        super().__init__(name, num=num, aliases=aliases, aka=aka)
+        if num is not None:
+            self._set_encoding_bits(num)
+
+    def set_color(self, color):
+        super().set_color(color)
+        if self._num is None and color is not None:
+            self._set_encoding_bits(color)
+
+    def _set_encoding_bits(self, num):
+        self.rexbit = (num >> 3) & 0x1
+        self.regbits = num & 0x7
+
+
+class Register64(X86Register):
     """ 64-bit register like 'rax' """
 
+    __slots__ = ()
+
     bitsize = 64
 
     @classmethod
@@ -14,36 +40,24 @@ class Register64(Register):
         """ Based on a number, get the corresponding register """
         return num2regmap[num]
 
-    @property
-    def rexbit(self):
-        return (self.num >> 3) & 0x1
-
-    @property
-    def regbits(self):
-        return self.num & 0x7
 
-
-class Register32(Register):
+class Register32(X86Register):
     """ 32-bit register like 'eax' """
 
+    __slots__ = ()
+
     bitsize = 32
 
     @classmethod
     def from_num(cls, num):
         return reg32_mp[num]
 
-    @property
-    def rexbit(self):
-        return (self.num >> 3) & 0x1
-
-    @property
-    def regbits(self):
-        return self.num & 0x7
-
 
 class Register16(Register):
     """ 16-bit register like 'ax' """
 
+    __slots__ = ()
+
     bitsize = 16
 
     @classmethod
@@ -51,25 +65,21 @@ class Register16(Register):
         return reg16_mp[num]
 
 
-class Register8(Register):
+class Register8(X86Register):
     """ 8-bit register like 'al' """
 
+    __slots__ = ()
+
     bitsize = 8
 
     @classmethod
     def from_num(cls, num):
         return reg8_mp[num]
 
-    @property
-    def rexbit(self):
-        return (self.num >> 3) & 0x1
-
-    @property
-    def regbits(self):
-        return self.num & 0x7
-
 
 class X87StackRegister(Register):
+    __slots__ = ()
+
     bitsize = 64
 
 
@@ -79,6 +89,8 @@ class X87StackRegister(Register):
 class XmmRegisterDouble(Register):
     """ Xmm register used to hold a f64 value. """
 
+    __slots__ = ()
+
     bitsize = 64
     # TODO: actually the register is 128 bit wide, but float is now 32 bit
     # bitsize = 32
@@ -92,6 +104,8 @@ class XmmRegisterDouble(Register):
 class XmmRegisterSingle(Register):
     """ Xmm register used to hold a f32 value. """
 
+    __slots__ = ()
+
     ty = "F"
     bitsize = 32
 
@@ -178,12 +192,12 @@ r14 = Register64("r14", 14, aliases=(r14d,))
 r15 = Register64("r15", 15, aliases=(r15d,))
 rip = Register64("rip", 999)
 
-low_regs = {rax, rcx, rdx, rbx, rsp, rbp, rsi, rdi}
+low_regs = frozenset({rax, rcx, rdx, rbx, rsp, rbp, rsi, rdi})
 
-high_regs = {r8, r9, r10, r11, r12, r13, r14, r15}
+high_regs = frozenset({r8, r9, r10, r11, r12, r13, r14, r15})
 full_registers = high_regs | low_regs
 
-registers64 = [
+registers64 = (
     rax,
     rbx,
     rdx,
@@ -200,12 +214,19 @@ registers64 = [
     r13,
     r14,
     r15,
-]
+)
 Register64.registers = registers64
 
-all_registers = list(sorted(full_registers, key=lambda r: r.num)) + [rip]
 
-num2regmap = {r.num: r for r in full_registers}
+def _table_by_num(registers):
+    """ Create a tuple of registers which can be indexed by number """
+    table = tuple(sorted(registers, key=lambda r: r.num))
+    assert all(i == r.num for i, r in enumerate(table))
+    return table
+
+
+num2regmap = _table_by_num(full_registers)
+all_registers = num2regmap + (rip,)
 
 
 st0 = X87StackRegister("st0", 0)
@@ -294,9 +315,9 @@ XmmRegisterSingle.registers = [
 ]
 
 
-xmm_mp = {r.num: r for r in XmmRegisterDouble.registers}
-xmm_single_mp = {r.num: r for r in XmmRegisterSingle.registers}
-reg8_mp = {r.num: r for r in Register8.registers}
+xmm_mp = _table_by_num(XmmRegisterDouble.registers)
+xmm_single_mp = _table_by_num(XmmRegisterSingle.registers)
+reg8_mp = _table_by_num(Register8.registers)
 reg16_mp = {r.num: r for r in Register16.registers}
 reg32_mp = {r.num: r for r in Register32.registers}
 
@@ -48,6 +48,12 @@ class BuildTask(Task):
 class OutputtingTask(Task):
     """ Base task for tasks that create an object file """
 
+    def outputs(self):
+        outputs = [self.relpath(self.get_argument('output'))]
+        if 'report' in self.arguments:
+            outputs.append(self.relpath(self.arguments['report']))
+        return outputs
+
     def store_object(self, obj):
         """ Store the object in the specified file """
         output_filename = self.relpath(self.get_argument('output'))
@@ -85,6 +91,12 @@ class AssembleTask(OutputtingTask):
 @register_task
 class C3CompileTask(OutputtingTask):
     """ Task that compiles C3 source for some target into an object file """
+    def inputs(self):
+        inputs = self.open_file_set(self.arguments['sources'])
+        if 'includes' in self.arguments:
+            inputs.extend(self.open_file_set(self.arguments['includes']))
+        return inputs
+
     def run(self):
         arch = self.get_argument('arch')
         sources = self.open_file_set(self.arguments['sources'])
@@ -154,6 +166,9 @@ class CCompileTask(OutputtingTask):
 @register_task
 class PascalCompileTask(OutputtingTask):
     """ Task that compiles pascal code for some target into an object file """
+    def inputs(self):
+        return self.open_file_set(self.arguments['sources'])
+
     def run(self):
         arch = self.get_argument('arch')
         sources = self.open_file_set(self.arguments['sources'])
@@ -180,6 +195,9 @@ class PascalCompileTask(OutputtingTask):
 @register_task
 class WasmCompileTask(OutputtingTask):
     """ Task that compiles a wasm module into an object file """
+    def inputs(self):
+        return self.open_file_set(self.arguments['source'])
+
     def run(self):
         arch = self.get_argument('arch')
         source = self.open_file_set(self.arguments['source'])
@@ -204,6 +222,12 @@ class WasmCompileTask(OutputtingTask):
 @register_task
 class LinkTask(OutputtingTask):
     """ Link together a collection of object files """
+    def inputs(self):
+        inputs = self.open_file_set(self.get_argument('objects'))
+        if 'layout' in self.arguments:
+            inputs.append(self.relpath(self.get_argument('layout')))
+        return inputs
+
     def run(self):
         if 'layout' in self.arguments:
             layout = self.relpath(self.get_argument('layout'))
@@ -226,6 +250,12 @@ class LinkTask(OutputtingTask):
 @register_task
 class ObjCopyTask(Task):
     """ Binary move parts of object code. """
+    def inputs(self):
+        return [self.relpath(self.get_argument('objectfile'))]
+
+    def outputs(self):
+        return [self.relpath(self.get_argument('output'))]
+
     def run(self):
         image_name = self.get_argument('imagename')
         output_filename = self.relpath(self.get_argument('output'))
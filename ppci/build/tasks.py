@@ -3,10 +3,20 @@
     have dependencies and it can be determined if they need to be run.
 """
 
+import hashlib
+import json
 import logging
 import re
 import os
 import glob
+import heapq
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from .. import __version__
+
+
+# Directory below the project basedir where incremental build state is kept:
+CACHE_DIRECTORY = '.ppci_cache'
 
 
 task_map = {}
@@ -36,7 +46,8 @@ class Project:
         self.name = name
         self.targets = {}
         self.properties = {}
-        self.macro_regex = re.compile(r'\$\{([^\}]+)\}')
+        self.macro_regex = re.compile(r'\$\{([^}]+)\}')
+        self._dep_cache = {}
 
     def set_property(self, name, value):
         """ Set a property in this project """
@@ -53,6 +64,11 @@ class Project:
         if target.name in self.targets:
             raise TaskError("Duplicate target '{}'".format(target.name))
         self.targets[target.name] = target
+        self.invalidate_dependencies()
+
+    def invalidate_dependencies(self):
+        """ Forget cached dependencies, after the target graph changed """
+        self._dep_cache.clear()
 
     def get_target(self, target_name):
         assert isinstance(target_name, str)
@@ -62,34 +78,112 @@ class Project:
 
     def expand_macros(self, txt):
         """ Replace all macros in txt with the correct properties """
-        while True:
-            mo = self.macro_regex.search(txt)
-            if not mo:
+        def replace(mo):
+            return self.get_property(mo.group(1))
+
+        # Loop, since property values can contain macros as well:
+        while '${' in txt:
+            new_txt = self.macro_regex.sub(replace, txt)
+            if new_txt == txt:
                 break
-            propname = mo.group(1)
-            propval = self.get_property(propname)
-            txt = txt[:mo.start()] + propval + txt[mo.end():]
+            txt = new_txt
         return txt
 
-    def dfs(self, target_name, state):
-        state.add(target_name)
-        target = self.get_target(target_name)
-        for dep in target.dependencies:
-            if dep in state:
-                raise TaskError('Dependency loop detected {} -> {}'
-                                .format(target_name, dep))
-            self.dfs(dep, state)
-
     def check_target(self, target_name):
-        state = set()
-        self.dfs(target_name, state)
+        """ Check that the target does not depend on itself.
+
+        This is a depth first search in which targets on the current path
+        are marked as busy and fully explored targets as done. Only an edge
+        to a busy target is a loop.
+        """
+        busy, done = 1, 2
+        state = {target_name: busy}
+        target = self.get_target(target_name)
+        stack = [(target_name, iter(target.dependencies))]
+        while stack:
+            name, deps = stack[-1]
+            for dep in deps:
+                dep_state = state.get(dep)
+                if dep_state == busy:
+                    raise TaskError('Dependency loop detected {} -> {}'
+                                    .format(name, dep))
+                elif dep_state is None:
+                    state[dep] = busy
+                    stack.append(
+                        (dep, iter(self.get_target(dep).dependencies)))
+                    break
+            else:
+                state[name] = done
+                stack.pop()
 
     def dependencies(self, target_name):
+        """ Get the names of all targets the given target depends on,
+        directly or indirectly, as a frozenset. """
         assert type(target_name) is str
-        target = self.get_target(target_name)
-        cdst = list(self.dependencies(dep) for dep in target.dependencies)
-        cdst.append(target.dependencies)
-        return set.union(*cdst)
+        if target_name not in self._dep_cache:
+            target = self.get_target(target_name)
+            seen = set()
+            queue = deque(target.dependencies)
+            while queue:
+                dep = queue.popleft()
+                if dep in seen:
+                    continue
+                seen.add(dep)
+                queue.extend(self.get_target(dep).dependencies)
+            self._dep_cache[target_name] = frozenset(seen)
+        return self._dep_cache[target_name]
+
+    def _dependency_graph(self, target_names):
+        """ Determine for the given targets how many of them each target
+        depends upon, and which of them depend upon each target. """
+        indegree = {name: 0 for name in target_names}
+        successors = defaultdict(list)
+        for name in indegree:
+            for dep in self.get_target(name).dependencies:
+                if dep in indegree:
+                    indegree[name] += 1
+                    successors[dep].append(name)
+        return indegree, successors
+
+    def toposort(self, target_names):
+        """ Sort the given target names such that each target comes after
+        the targets it depends upon. Ties are broken by name. """
+        indegree, successors = self._dependency_graph(target_names)
+        ready = [name for name, count in indegree.items() if count == 0]
+        heapq.heapify(ready)
+        result = []
+        while ready:
+            name = heapq.heappop(ready)
+            result.append(name)
+            for successor in successors[name]:
+                indegree[successor] -= 1
+                if indegree[successor] == 0:
+                    heapq.heappush(ready, successor)
+
+        if len(result) != len(indegree):
+            raise TaskError('Dependency loop detected')
+        return result
+
+    def levels(self, target_names):
+        """ Group the given target names into levels. The targets in a
+        level only depend upon targets in earlier levels, so they can be
+        run in parallel. """
+        indegree, successors = self._dependency_graph(target_names)
+        level = sorted(name for name, count in indegree.items() if count == 0)
+        result = []
+        while level:
+            result.append(level)
+            next_level = []
+            for name in level:
+                for successor in successors[name]:
+                    indegree[successor] -= 1
+                    if indegree[successor] == 0:
+                        next_level.append(successor)
+            level = sorted(next_level)
+
+        if sum(map(len, result)) != len(indegree):
+            raise TaskError('Dependency loop detected')
+        return result
 
 
 class Target:
@@ -106,9 +200,8 @@ class Target:
     def add_dependency(self, target_name):
         """ Add another task as a dependency for this task """
         self.dependencies.add(target_name)
-
-    def __gt__(self, other):
-        return other.name in self.project.dependencies(self.name)
+        if self.project is not None:
+            self.project.invalidate_dependencies()
 
     def __repr__(self):
         return 'Target "{}"'.format(self.name)
@@ -121,6 +214,9 @@ class Task:
         self.target = target
         self.name = self.__class__.__name__
         self.arguments = kwargs
+        # Glob results, so that inputs() and run() scan the filesystem once.
+        # This lives as long as the task, since other tasks create files.
+        self._globs = {}
 
     def get_argument(self, name, default=None):
         if name not in self.arguments:
@@ -152,13 +248,28 @@ class Task:
         assert type(s) is str
         file_names = []
         for part in s.split(';'):
-            new_files = glob.glob(self.relpath(part))
+            pattern = self.relpath(part)
+            if pattern not in self._globs:
+                self._globs[pattern] = glob.glob(pattern)
+            new_files = self._globs[pattern]
             if not new_files:
                 raise TaskError('{} not found'.format(part))
             for filename in new_files:
                 file_names.append(os.path.normpath(filename))
         return file_names
 
+    def inputs(self):
+        """ Return the names of the files this task reads.
+
+        Implement this method to allow incremental builds to skip the task
+        when these files and the task arguments did not change.
+        """
+        return []
+
+    def outputs(self):
+        """ Return the names of the files this task creates """
+        return []
+
     def run(self):  # pragma: no cover
         """ Implement this method when creating a custom task """
         raise NotImplementedError("Implement this abstract method!")
@@ -168,9 +279,19 @@ class Task:
 
 
 class TaskRunner:
-    """ Basic task runner that can run some tasks in sequence """
-    def __init__(self):
+    """ Basic task runner that can run some tasks in sequence.
+
+    When concurrency is larger than one, targets that do not depend upon
+    each other are run in parallel threads.
+
+    When incremental is set, tasks which declare their inputs are skipped
+    when their inputs and arguments are the same as during their last
+    successful run. This state is stored in the project basedir.
+    """
+    def __init__(self, concurrency=1, incremental=False):
         self.logger = logging.getLogger('taskrunner')
+        self.concurrency = concurrency
+        self.incremental = incremental
 
     def get_task(self, name):
         """ Tries to load the task type """
@@ -198,27 +319,102 @@ class TaskRunner:
         for target in target_list:
             project.check_target(target)
 
-        # Calculate all dependencies:
-        # TODO: make this understandable:
-        target_list = set.union(
-            *[project.dependencies(t) for t in target_list])\
-            .union(set(target_list))
-
-        # Lookup actual targets:
-        target_list = [project.get_target(target_name)
-                       for target_name in target_list]
-        target_list.sort()
+        # The targets to run are the requested ones and their dependencies:
+        target_list = set().union(
+            *map(project.dependencies, target_list), target_list)
 
-        self.logger.info('Target sequence: {}'.format(target_list))
+        if self.concurrency > 1:
+            self.run_parallel(project, target_list)
+        else:
+            # Lookup actual targets in dependency order:
+            target_list = [project.get_target(target_name)
+                           for target_name in project.toposort(target_list)]
 
-        # Run tasks:
-        for target in target_list:
-            self.logger.info('Target {} Started'.format(target.name))
-            for tname, props in target.tasks:
-                for arg in props:
-                    props[arg] = project.expand_macros(props[arg])
-                task = self.get_task(tname)(target, props)
-                self.logger.info('Running {}'.format(task))
-                task.run()
-            self.logger.info('Target {} Ready'.format(target.name))
+            self.logger.info('Target sequence: {}'.format(target_list))
+            for target in target_list:
+                self.run_target(project, target)
         self.logger.info('All targets done!')
+
+    def run_parallel(self, project, target_names):
+        """ Run targets level by level, each level in parallel """
+        levels = project.levels(target_names)
+        self.logger.info('Target levels: {}'.format(levels))
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for level in levels:
+                futures = [
+                    executor.submit(
+                        self.run_target, project, project.get_target(name))
+                    for name in level]
+
+                # Wait for the whole level, raising the first error:
+                for future in futures:
+                    future.result()
+
+    def run_target(self, project, target):
+        """ Run all tasks of a single target """
+        self.logger.info('Target {} Started'.format(target.name))
+        cache_filename = self.get_cache_filename(project, target)
+        cache = self.load_cache(cache_filename)
+        for index, (tname, props) in enumerate(target.tasks):
+            for arg in props:
+                props[arg] = project.expand_macros(props[arg])
+            task = self.get_task(tname)(target, props)
+            key = '{}:{}'.format(index, tname)
+            digest = self.task_digest(task) if cache_filename else None
+            if digest and cache.get(key) == digest:
+                self.logger.info('{} is up to date'.format(task))
+                continue
+
+            self.logger.info('Running {}'.format(task))
+            task.run()
+            if digest:
+                cache[key] = digest
+                self.store_cache(cache_filename, cache)
+        self.logger.info('Target {} Ready'.format(target.name))
+
+    def get_cache_filename(self, project, target):
+        """ Get the file with incremental build state of a target """
+        if self.incremental and 'basedir' in project.properties:
+            return os.path.join(
+                project.get_property('basedir'), CACHE_DIRECTORY,
+                '{}.json'.format(target.name))
+
+    def load_cache(self, cache_filename):
+        """ Load incremental build state, starting over if it is unusable """
+        if cache_filename and os.path.exists(cache_filename):
+            with open(cache_filename, 'r') as f:
+                try:
+                    return json.load(f)
+                except ValueError:
+                    self.logger.warning(
+                        'Ignoring invalid cache {}'.format(cache_filename))
+        return {}
+
+    def store_cache(self, cache_filename, cache):
+        """ Save incremental build state """
+        os.makedirs(os.path.dirname(cache_filename), exist_ok=True)
+        with open(cache_filename, 'w') as f:
+            json.dump(cache, f)
+
+    def task_digest(self, task):
+        """ Hash the arguments and inputs of a task.
+
+        Input files are hashed by their modification time and size, which
+        is cheap. Returns None when the task cannot be skipped.
+        """
+        inputs = task.inputs()
+        if not inputs or not all(map(os.path.exists, task.outputs())):
+            return
+
+        digest = hashlib.sha256()
+        digest.update(repr((
+            __version__, task.name, sorted(task.arguments.items())
+        )).encode())
+        for filename in inputs:
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                return
+            digest.update(repr(
+                (filename, stat.st_mtime_ns, stat.st_size)).encode())
+        return digest.hexdigest()
@@ -17,6 +17,18 @@ parser.add_argument(
     help="use buildfile, otherwise build.xml is the default",
     default="build.xml",
 )
+parser.add_argument(
+    "--incremental",
+    action="store_true",
+    help="skip tasks whose inputs did not change since their last run",
+)
+parser.add_argument(
+    "-j",
+    "--concurrency",
+    type=int,
+    default=1,
+    help="number of independent targets to run in parallel",
+)
 parser.add_argument("targets", metavar="target", nargs="*")
 
 
@@ -24,7 +36,12 @@ def build(args=None):
     """ Run the build command from command line. Used by ppci-build.py """
     args = parser.parse_args(args)
     with LogSetup(args):
-        api.construct(args.buildfile, args.targets)
+        api.construct(
+            args.buildfile,
+            args.targets,
+            incremental=args.incremental,
+            concurrency=args.concurrency,
+        )
 
 
 if __name__ == "__main__":
@@ -37,7 +37,11 @@ def c3c(args=None):
         march = get_arch_from_args(args)
 
         ir_module = api.c3_to_ir(
-            args.sources, args.include, march, reporter=log_setup.reporter
+            args.sources,
+            args.include,
+            march,
+            reporter=log_setup.reporter,
+            debug=args.g,
         )
 
         do_compile([ir_module], march, log_setup.reporter, log_setup.args)
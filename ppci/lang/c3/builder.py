@@ -17,7 +17,7 @@ from .scope import SemanticError
 from .context import Context
 
 
-def c3_to_ir(sources, includes, march, reporter=None):
+def c3_to_ir(sources, includes, march, reporter=None, debug=True):
     """ Compile c3 sources to ir-code for the given architecture. """
     logger = logging.getLogger("c3c")
     march = get_arch(march)
@@ -29,7 +29,7 @@ def c3_to_ir(sources, includes, march, reporter=None):
     sources = [get_file(fn) for fn in sources]
     includes = [get_file(fn) for fn in includes]
     diag = DiagnosticsManager()
-    c3b = C3Builder(diag, march.info)
+    c3b = C3Builder(diag, march.info, debug=debug)
 
     try:
         _, ir_module = c3b.build(sources, includes)
@@ -53,12 +53,12 @@ class C3Builder:
 
     logger = logging.getLogger("c3")
 
-    def __init__(self, diag, arch_info):
+    def __init__(self, diag, arch_info, debug=True):
         assert isinstance(arch_info, ArchInfo)
         self.diag = diag
         self.lexer = Lexer(diag)
         self.parser = Parser(diag)
-        self.codegen = CodeGenerator(diag)
+        self.codegen = CodeGenerator(diag, debug=debug)
         self.verifier = Verifier()
         self.arch_info = arch_info
 
@@ -6,6 +6,35 @@ from ... import irutils
 from ...binutils import debuginfo
 from . import astnodes as ast
 from .scope import SemanticError
+from .visitor import Visitor
+
+FLOAT_TYPES = {32: ir.f32, 64: ir.f64}
+SIGNED_TYPES = {8: ir.i8, 16: ir.i16, 32: ir.i32, 64: ir.i64}
+UNSIGNED_TYPES = {8: ir.u8, 16: ir.u16, 32: ir.u32, 64: ir.u64}
+
+# Name of the ir cast for each (from, to) kind of type cast. None means
+# no cast instruction is needed:
+CAST_NAMES = {
+    ("ptr", "ptr"): None,
+    ("int", "ptr"): "int2ptr",
+    ("ptr", "int"): "ptr2int",
+    ("int", "int"): "cast",
+    ("int", "float"): "cast",
+    ("float", "int"): "cast",
+    ("float", "float"): "cast",
+}
+
+
+def cast_kind(typ):
+    """ Determine the kind of a resolved type for type casting """
+    if isinstance(typ, ast.IntegerType):
+        return "int"
+    elif isinstance(typ, ast.FloatType):
+        return "float"
+    elif isinstance(typ, ast.PointerType):
+        return "ptr"
+    else:
+        return None
 
 
 class CodeGenerator:
@@ -19,20 +48,58 @@ class CodeGenerator:
     And structured datatypes are rewritten.
 
     Type checking is done in one run with code generation.
+
+    When debug is False, parameters which are never assigned and whose
+    address is never taken are used directly, without a copy in memory.
+    Such parameters have no debug variable.
     """
 
     logger = logging.getLogger("c3cgen")
 
-    def __init__(self, diag):
+    def __init__(self, diag, debug=True):
         self.builder = irutils.Builder()
         self.diag = diag
+        self.debug = debug
         self.context = None
         self.debug_db = debuginfo.DebugDb()
         self.module_ok = False
+        self._const_cache = {}
+        self._ir_type_cache = {}
+        self.param_values = {}
+        self._stmt_map = {
+            ast.Compound: self.gen_compound_stmt,
+            ast.Empty: self.gen_empty_stmt,
+            ast.Assignment: self.gen_assignment_stmt,
+            ast.VariableDeclaration: self.gen_variable_declaration,
+            ast.ExpressionStatement: self.gen_expression_stmt,
+            ast.If: self.gen_if_stmt,
+            ast.Return: self.gen_return_stmt,
+            ast.While: self.gen_while,
+            ast.For: self.gen_for_stmt,
+            ast.Switch: self.gen_switch_stmt,
+        }
+        self._expr_map = {
+            ast.Binop: self.gen_binop,
+            ast.Unop: self.gen_unop,
+            ast.Identifier: self.gen_identifier,
+            ast.Deref: self.gen_dereference,
+            ast.Member: self.gen_member_expr,
+            ast.Index: self.gen_index_expr,
+            ast.Literal: self.gen_literal_expr,
+            ast.TypeCast: self.gen_type_cast,
+            ast.Sizeof: self.gen_sizeof,
+            ast.FunctionCall: self.gen_function_call,
+        }
+        self._cond_map = {
+            ast.Binop: self.gen_cond_binop,
+            ast.Literal: self.gen_cond_literal,
+            ast.Unop: self.gen_cond_unop,
+        }
 
     def gen(self, context):
         """ Generate code for a whole context """
         self.context = context
+        self._ir_type_cache = {}
         ir_module = ir.Module("c3_code", debug_db=self.debug_db)
         self.builder = irutils.Builder()
         self.builder.module = ir_module
@@ -132,6 +199,34 @@ class CodeGenerator:
             self.debug_db.enter(instruction, debuginfo.DebugLocation(loc))
         return instruction
 
+    def get_const(self, value, name, ty, loc=None):
+        """Get an integer constant usable in the current block.
+
+        Constants are emitted once per block and reused afterwards.
+        The location is only recorded when the constant is emitted.
+        """
+        key = (self.builder.block, value, ty)
+        if key in self._const_cache:
+            return self._const_cache[key]
+        const = self.emit(ir.Const(value, name, ty), loc=loc)
+        self._const_cache[key] = const
+        return const
+
+    def block_is_dead(self):
+        """Determine whether the current block can never be reached.
+
+        After a return statement, code is generated into a fresh block
+        which nothing jumps to. As long as it is empty, it does not need
+        to be terminated, since delete_unreachable will remove it.
+        """
+        block = self.builder.block
+        return block.is_empty and not block.is_used and not block.is_entry
+
+    def close_block(self, target):
+        """ Jump to target, unless the current block is dead """
+        if not self.block_is_dead():
+            self.builder.emit(ir.Jump(target))
+
     def new_block(self):
         """ Create a new basic block into the current function """
         return self.builder.new_block()
@@ -191,6 +286,7 @@ class CodeGenerator:
         """
         ir_function = self.get_ir_function(function)
         self.builder.set_function(ir_function)
+        self._const_cache = {}
         first_block = self.new_block()
         self.builder.set_block(first_block)
         ir_function.entry = first_block
@@ -220,13 +316,25 @@ class CodeGenerator:
         )
         self.debug_db.enter(ir_function, dfi)
 
+        # Parameters which are never assigned and whose address is never
+        # taken, can be used directly without a copy in memory. The debugger
+        # can only locate variables in memory, so keep them when debugging:
+        self.param_values = {}
+        if not self.debug:
+            in_memory = self.get_parameters_in_memory(function)
+            for param in function.parameters:
+                if param not in in_memory:
+                    self.param_values[param] = param_map[param]
+
         # generate room for locals:
         for sym in function.inner_scope:
+            if sym in self.param_values:
+                continue
             var_name = "var_{}".format(sym.name)
             size = self.context.size_of(sym.typ)
             alignment = size  # TODO: fix this somehow?
-            alloc = self.emit(ir.Alloc(var_name, size, alignment))
-            variable = self.emit(ir.AddressOf(alloc, var_name))
+            alloc = self.builder.emit(ir.Alloc(var_name, size, alignment))
+            variable = self.builder.emit(ir.AddressOf(alloc, var_name))
             if sym.isParameter:
                 # Get the parameter from earlier:
                 parameter = param_map[sym]
@@ -234,7 +342,7 @@ class CodeGenerator:
                 # For paramaters, allocate space and copy the value into
                 # memory. Later, the mem2reg pass will extract these values.
                 # Move parameter into local copy:
-                self.emit(ir.Store(parameter, variable))
+                self.builder.emit(ir.Store(parameter, variable))
             elif isinstance(sym, ast.Variable):
                 pass
             else:  # pragma: no cover
@@ -254,7 +362,8 @@ class CodeGenerator:
         if not self.builder.block.is_closed:
             # In case of void function, introduce exit instruction:
             if self.context.equal_types("void", function.typ.returntype):
-                self.emit(ir.Exit())
+                if not self.block_is_dead():
+                    self.builder.emit(ir.Exit())
             else:
                 if self.builder.block.is_empty:
                     last_block = self.builder.block
@@ -271,22 +380,63 @@ class CodeGenerator:
         ir_function.delete_unreachable()
         self.builder.set_function(None)
 
+    def get_parameters_in_memory(self, function):
+        """Determine the parameters of a function which must live in memory.
+
+        These are the parameters which are assigned to, or whose address
+        is taken.
+        """
+        in_memory = set()
+
+        def check_node(node):
+            if isinstance(node, ast.VariableDeclaration):
+                # The visitor does not descend into initial values:
+                if node.var.ival is not None:
+                    check_ival(node.var.ival)
+                return
+            elif isinstance(node, ast.Assignment):
+                ref = node.lval
+            elif isinstance(node, ast.Unop) and node.op == "&":
+                ref = node.a
+            else:
+                return
+            if isinstance(ref, ast.Identifier):
+                in_memory.add(self.context.resolve_symbol(ref))
+
+        def check_ival(ival):
+            if isinstance(ival, ast.ExpressionList):
+                for expr in ival.expressions:
+                    check_ival(expr)
+            elif isinstance(ival, ast.NamedExpressionList):
+                for _, expr in ival.expressions:
+                    check_ival(expr)
+            else:
+                visitor.visit(ival)
+
+        visitor = Visitor(pre=check_node)
+        visitor.visit(function.body)
+        return in_memory
+
     def get_ir_int(self):
-        mapping = {1: ir.i8, 2: ir.i16, 4: ir.i32, 8: ir.i64}
-        return mapping[self.context.get_type("int").byte_size]
+        return self.get_ir_type("int")
 
     def get_ir_type(self, cty):
         """ Given a certain type, get the corresponding ir-type """
         cty = self.context.get_type(cty)
+        if cty in self._ir_type_cache:
+            return self._ir_type_cache[cty]
+        ir_typ = self._determine_ir_type(cty)
+        self._ir_type_cache[cty] = ir_typ
+        return ir_typ
+
+    def _determine_ir_type(self, cty):
+        """ Map a resolved type onto an ir-type """
         if isinstance(cty, ast.FloatType):
-            float_types = {32: ir.f32, 64: ir.f64}
-            return float_types[cty.bits]
+            return FLOAT_TYPES[cty.bits]
         elif isinstance(cty, ast.SignedIntegerType):
-            signed_types = {8: ir.i8, 16: ir.i16, 32: ir.i32, 64: ir.i64}
-            return signed_types[cty.bits]
+            return SIGNED_TYPES[cty.bits]
         elif isinstance(cty, ast.UnsignedIntegerType):
-            unsigned_types = {8: ir.u8, 16: ir.u16, 32: ir.u32, 64: ir.u64}
-            return unsigned_types[cty.bits]
+            return UNSIGNED_TYPES[cty.bits]
         elif self.context.equal_types(cty, "void"):  # pragma: no cover
             # Void's have no type
             raise RuntimeError("Cannot get void type")
@@ -337,43 +487,41 @@ class CodeGenerator:
         """ Generate code for a statement """
         try:
             assert isinstance(code, ast.Statement)
-            if isinstance(code, ast.Compound):
-                for statement in code.statements:
-                    self.gen_stmt(statement)
-            elif isinstance(code, ast.Empty):
-                pass
-            elif isinstance(code, ast.Assignment):
-                self.gen_assignment_stmt(code)
-            elif isinstance(code, ast.VariableDeclaration):
-                self.gen_local_var_init(code.var)
-            elif isinstance(code, ast.ExpressionStatement):
-                # This must be always a void function call
-                assert isinstance(code.ex, ast.FunctionCall)
-                value = self.gen_function_call(code.ex)
-                assert self.context.equal_types("void", code.ex.typ)
-                assert value is None
-            elif isinstance(code, ast.If):
-                self.gen_if_stmt(code)
-            elif isinstance(code, ast.Return):
-                self.gen_return_stmt(code)
-            elif isinstance(code, ast.While):
-                self.gen_while(code)
-            elif isinstance(code, ast.For):
-                self.gen_for_stmt(code)
-            elif isinstance(code, ast.Switch):
-                self.gen_switch_stmt(code)
-            else:  # pragma: no cover
+            gen_handler = self._stmt_map.get(type(code))
+            if gen_handler is None:  # pragma: no cover
                 raise NotImplementedError(str(code))
+            gen_handler(code)
         except SemanticError as exc:
             self.error(exc.msg, exc.loc)
 
+    def gen_compound_stmt(self, code):
+        """ Generate code for a compound statement """
+        for statement in code.statements:
+            self.gen_stmt(statement)
+
+    def gen_empty_stmt(self, code):
+        """ Generate code for an empty statement """
+        pass
+
+    def gen_variable_declaration(self, code):
+        """ Generate code for a local variable declaration """
+        self.gen_local_var_init(code.var)
+
+    def gen_expression_stmt(self, code):
+        """ Generate code for an expression statement """
+        # This must be always a void function call
+        assert isinstance(code.ex, ast.FunctionCall)
+        value = self.gen_function_call(code.ex)
+        assert self.context.equal_types("void", code.ex.typ)
+        assert value is None
+
     def gen_return_stmt(self, code):
         """ Generate code for return statement """
         if code.expr:
             ret_val = self.gen_expr_code(code.expr, rvalue=True)
-            self.emit(ir.Return(ret_val))
+            self.builder.emit(ir.Return(ret_val))
         else:
-            self.emit(ir.Exit())
+            self.builder.emit(ir.Exit())
         self.builder.set_block(self.new_block())
 
     def gen_assignment_stmt(self, code):
@@ -444,8 +592,8 @@ class CodeGenerator:
 
             # Increment pointer with appropriate size:
             size = self.context.size_of(expr.typ)
-            inc = self.emit(ir.Const(size, "inc", ir.ptr))
-            ptr = self.emit(ptr + inc)
+            inc = self.get_const(size, "inc", ir.ptr)
+            ptr = self.builder.emit(ptr + inc)
             return ptr
 
     def gen_if_stmt(self, code):
@@ -456,10 +604,10 @@ class CodeGenerator:
         self.gen_cond_code(code.condition, true_block, false_block)
         self.builder.set_block(true_block)
         self.gen_stmt(code.truestatement)
-        self.emit(ir.Jump(final_block))
+        self.close_block(final_block)
         self.builder.set_block(false_block)
         self.gen_stmt(code.falsestatement)
-        self.emit(ir.Jump(final_block))
+        self.close_block(final_block)
         self.builder.set_block(final_block)
 
     def gen_while(self, code):
@@ -467,12 +615,12 @@ class CodeGenerator:
         main_block = self.new_block()
         test_block = self.new_block()
         final_block = self.new_block()
-        self.emit(ir.Jump(test_block))
+        self.builder.emit(ir.Jump(test_block))
         self.builder.set_block(test_block)
         self.gen_cond_code(code.condition, main_block, final_block)
         self.builder.set_block(main_block)
         self.gen_stmt(code.statement)
-        self.emit(ir.Jump(test_block))
+        self.close_block(test_block)
         self.builder.set_block(final_block)
 
     def gen_for_stmt(self, code):
@@ -481,13 +629,13 @@ class CodeGenerator:
         test_block = self.new_block()
         final_block = self.new_block()
         self.gen_stmt(code.init)
-        self.emit(ir.Jump(test_block))
+        self.builder.emit(ir.Jump(test_block))
         self.builder.set_block(test_block)
         self.gen_cond_code(code.condition, main_block, final_block)
         self.builder.set_block(main_block)
         self.gen_stmt(code.statement)
         self.gen_stmt(code.final)
-        self.emit(ir.Jump(test_block))
+        self.close_block(test_block)
         self.builder.set_block(final_block)
 
     def gen_switch_stmt(self, switch):
@@ -497,7 +645,7 @@ class CodeGenerator:
 
         final_block = self.new_block()
         test_block = self.new_block()
-        self.emit(ir.Jump(test_block))
+        self.builder.emit(ir.Jump(test_block))
 
         def_block = None
         # Generate code in linear way:
@@ -506,7 +654,7 @@ class CodeGenerator:
             code_block = self.new_block()
             self.builder.set_block(code_block)
             self.gen_stmt(option_code)
-            self.emit(ir.Jump(final_block))
+            self.builder.emit(ir.Jump(final_block))
 
             if option_val is None:
                 # default case
@@ -527,86 +675,83 @@ class CodeGenerator:
 
         self.builder.set_block(test_block)
         assert def_block
-        self.emit(ir.Jump(def_block))
+        self.builder.emit(ir.Jump(def_block))
         self.builder.set_block(final_block)
 
     def gen_cond_code(self, expr, bbtrue, bbfalse):
         """Generate conditional logic.
         Implement sequential logical operators."""
-        if isinstance(expr, ast.Binop):
-            if expr.op == "or":
-                # Implement sequential logic:
-                second_block = self.new_block()
-                self.gen_cond_code(expr.a, bbtrue, second_block)
-                self.builder.set_block(second_block)
-                self.gen_cond_code(expr.b, bbtrue, bbfalse)
-            elif expr.op == "and":
-                # Implement sequential logic:
-                second_block = self.new_block()
-                self.gen_cond_code(expr.a, second_block, bbfalse)
-                self.builder.set_block(second_block)
-                self.gen_cond_code(expr.b, bbtrue, bbfalse)
-            elif expr.op in ["==", ">", "<", "!=", "<=", ">="]:
-                lhs = self.gen_expr_code(expr.a, rvalue=True)
-                rhs = self.gen_expr_code(expr.b, rvalue=True)
-                self.context.equal_types(expr.a.typ, expr.b.typ)
-                self.emit(
-                    ir.CJump(lhs, expr.op, rhs, bbtrue, bbfalse), loc=expr.loc
-                )
-            else:  # pragma: no cover
-                raise NotImplementedError(str(expr.op))
-        elif isinstance(expr, ast.Literal):
-            self.gen_expr_code(expr)
-            if expr.val:
-                self.emit(ir.Jump(bbtrue), loc=expr.loc)
-            else:
-                self.emit(ir.Jump(bbfalse), loc=expr.loc)
-        elif isinstance(expr, ast.Unop) and expr.op == "not":
-            # In case of not, simply swap true and false!
-            self.gen_cond_code(expr.a, bbfalse, bbtrue)
+        gen_handler = self._cond_map.get(type(expr))
+        if gen_handler is not None:
+            gen_handler(expr, bbtrue, bbfalse)
         elif isinstance(expr, ast.Expression):
-            # Evaluate expression, make sure it is boolean and compare it
-            # with true:
-            value = self.gen_expr_code(expr, rvalue=True)
-            assert self.context.equal_types(expr.typ, "bool")
-            true_val = self.emit(
-                ir.Const(1, "true", self.get_ir_type(expr.typ))
-            )
-            self.emit(ir.CJump(value, "==", true_val, bbtrue, bbfalse))
+            self.gen_cond_expression(expr, bbtrue, bbfalse)
         else:  # pragma: no cover
             raise NotImplementedError(str(expr))
 
         # Check that the condition is a boolean value:
         assert self.context.equal_types(expr.typ, "bool")
 
+    def gen_cond_binop(self, expr, bbtrue, bbfalse):
+        """ Generate conditional logic for a binary operator """
+        if expr.op == "or":
+            # Implement sequential logic:
+            second_block = self.new_block()
+            self.gen_cond_code(expr.a, bbtrue, second_block)
+            self.builder.set_block(second_block)
+            self.gen_cond_code(expr.b, bbtrue, bbfalse)
+        elif expr.op == "and":
+            # Implement sequential logic:
+            second_block = self.new_block()
+            self.gen_cond_code(expr.a, second_block, bbfalse)
+            self.builder.set_block(second_block)
+            self.gen_cond_code(expr.b, bbtrue, bbfalse)
+        elif expr.op in ["==", ">", "<", "!=", "<=", ">="]:
+            lhs = self.gen_expr_code(expr.a, rvalue=True)
+            rhs = self.gen_expr_code(expr.b, rvalue=True)
+            self.emit(
+                ir.CJump(lhs, expr.op, rhs, bbtrue, bbfalse), loc=expr.loc
+            )
+        else:  # pragma: no cover
+            raise NotImplementedError(str(expr.op))
+
+    def gen_cond_literal(self, expr, bbtrue, bbfalse):
+        """ Generate conditional logic for a literal """
+        self.gen_expr_code(expr)
+        if expr.val:
+            self.emit(ir.Jump(bbtrue), loc=expr.loc)
+        else:
+            self.emit(ir.Jump(bbfalse), loc=expr.loc)
+
+    def gen_cond_unop(self, expr, bbtrue, bbfalse):
+        """ Generate conditional logic for a unary operator """
+        if expr.op == "not":
+            # In case of not, simply swap true and false!
+            self.gen_cond_code(expr.a, bbfalse, bbtrue)
+        else:
+            self.gen_cond_expression(expr, bbtrue, bbfalse)
+
+    def gen_cond_expression(self, expr, bbtrue, bbfalse):
+        """ Evaluate a boolean expression and jump on its value """
+        # Evaluate expression, make sure it is boolean and compare it
+        # with true:
+        value = self.gen_expr_code(expr, rvalue=True)
+        assert self.context.equal_types(expr.typ, "bool")
+        true_val = self.builder.emit(
+            ir.Const(1, "true", self.get_ir_type(expr.typ))
+        )
+        self.builder.emit(ir.CJump(value, "==", true_val, bbtrue, bbfalse))
+
     def gen_expr_code(self, expr: ast.Expression, rvalue=False) -> ir.Value:
         """ Generate code for an expression. Return the generated ir-value """
         assert isinstance(expr, ast.Expression)
         if expr.is_bool:
             value = self.gen_bool_expr(expr)
         else:
-            if isinstance(expr, ast.Binop):
-                value = self.gen_binop(expr)
-            elif isinstance(expr, ast.Unop):
-                value = self.gen_unop(expr)
-            elif isinstance(expr, ast.Identifier):
-                value = self.gen_identifier(expr)
-            elif isinstance(expr, ast.Deref):
-                value = self.gen_dereference(expr)
-            elif isinstance(expr, ast.Member):
-                value = self.gen_member_expr(expr)
-            elif isinstance(expr, ast.Index):
-                value = self.gen_index_expr(expr)
-            elif isinstance(expr, ast.Literal):
-                value = self.gen_literal_expr(expr)
-            elif isinstance(expr, ast.TypeCast):
-                value = self.gen_type_cast(expr)
-            elif isinstance(expr, ast.Sizeof):
-                value = self.gen_sizeof(expr)
-            elif isinstance(expr, ast.FunctionCall):
-                value = self.gen_function_call(expr)
-            else:  # pragma: no cover
+            gen_handler = self._expr_map.get(type(expr))
+            if gen_handler is None:  # pragma: no cover
                 raise NotImplementedError(str(expr))
+            value = gen_handler(expr)
 
         assert isinstance(value, ir.Value)
 
@@ -621,7 +766,7 @@ class CodeGenerator:
             assert isinstance(val_typ, (ast.PointerType, ast.BaseType))
 
             # Determine loaded type:
-            load_ty = self.get_ir_type(expr.typ)
+            load_ty = self.get_ir_type(val_typ)
 
             # Load the value:
             value = self.emit(ir.Load(value, "load", load_ty), loc=expr.loc)
@@ -635,8 +780,8 @@ class CodeGenerator:
         expr.lvalue = False
 
         type_size = self.context.size_of(expr.query_typ)
-        return self.emit(
-            ir.Const(type_size, "sizeof", self.get_ir_int()), loc=expr.loc
+        return self.get_const(
+            type_size, "sizeof", self.get_ir_int(), loc=expr.loc
         )
 
     def gen_dereference(self, expr: ast.Deref):
@@ -667,7 +812,7 @@ class CodeGenerator:
         elif expr.op == "-":
             rhs = self.gen_expr_code(expr.a, rvalue=True)
             expr.lvalue = False
-            return self.emit(ir.Unop("-", rhs, "unary_minus", rhs.ty))
+            return self.builder.emit(ir.Unop("-", rhs, "unary_minus", rhs.ty))
         else:  # pragma: no cover
             raise NotImplementedError(str(expr.op))
 
@@ -684,17 +829,21 @@ class CodeGenerator:
 
         # True path:
         self.builder.set_block(true_block)
-        true_val = self.emit(ir.Const(1, "true", self.get_ir_type(expr.typ)))
-        self.emit(ir.Jump(final_block))
+        true_val = self.builder.emit(
+            ir.Const(1, "true", self.get_ir_type(expr.typ))
+        )
+        self.builder.emit(ir.Jump(final_block))
 
         # False path:
         self.builder.set_block(false_block)
-        false_val = self.emit(ir.Const(0, "false", self.get_ir_type(expr.typ)))
-        self.emit(ir.Jump(final_block))
+        false_val = self.builder.emit(
+            ir.Const(0, "false", self.get_ir_type(expr.typ))
+        )
+        self.builder.emit(ir.Jump(final_block))
 
         # Final path:
         self.builder.set_block(final_block)
-        phi = self.emit(ir.Phi("bool_res", self.get_ir_type(expr.typ)))
+        phi = self.builder.emit(ir.Phi("bool_res", self.get_ir_type(expr.typ)))
         phi.set_incoming(false_block, false_val)
         phi.set_incoming(true_block, true_val)
 
@@ -714,8 +863,6 @@ class CodeGenerator:
         assert isinstance(a_val, ir.Value)
         assert isinstance(b_val, ir.Value)
 
-        self.context.equal_types(expr.a.typ, expr.b.typ)
-
         return self.emit(
             ir.Binop(a_val, expr.op, b_val, "binop", a_val.ty), loc=expr.loc
         )
@@ -726,14 +873,17 @@ class CodeGenerator:
         target = self.context.resolve_symbol(expr)
 
         # This returns the dereferenced variable.
-        if isinstance(target, ast.Variable):
+        if target in self.param_values:
+            expr.lvalue = False
+            value = self.param_values[target]
+        elif isinstance(target, ast.Variable):
             expr.lvalue = True
             value = self.context.var_map[target]
         elif isinstance(target, ast.Constant):
             expr.lvalue = False
             c_val = self.context.get_constant_value(target)
             c_typ = self.get_ir_type(target.typ)
-            value = self.emit(ir.Const(c_val, target.name, c_typ))
+            value = self.builder.emit(ir.Const(c_val, target.name, c_typ))
         else:  # pragma: no cover
             raise NotImplementedError(str(target))
         return value
@@ -775,14 +925,14 @@ class CodeGenerator:
         # expr must be lvalue because we handle with addresses of variables
         assert expr.lvalue
 
-        # Calculate offset into struct:
-        base_type = self.context.get_type(expr.base.typ)
-        offset = self.emit(
-            ir.Const(base_type.field_offset(expr.field), "offset", ir.ptr)
-        )
+        # Calculate offset into struct, the first field is at the base:
+        field_offset = basetype.field_offset(expr.field)
+        if field_offset == 0:
+            return base
+        offset = self.get_const(field_offset, "offset", ir.ptr)
 
         # Calculate memory address of field:
-        return self.emit(ir.add(base, offset, "mem_addr", ir.ptr))
+        return self.builder.emit(ir.add(base, offset, "mem_addr", ir.ptr))
 
     def gen_index_expr(self, expr):
         """ Array indexing """
@@ -801,15 +951,29 @@ class CodeGenerator:
         element_size = self.context.size_of(element_type)
         expr.lvalue = True
 
-        int_ir_type = self.get_ir_type("int")
+        # The first element is located at the base address:
+        if isinstance(idx, ir.Const) and idx.value == 0:
+            return base
 
-        # Generate constant:
-        e_size = self.emit(ir.Const(element_size, "element_size", int_ir_type))
+        int_ir_type = self.get_ir_type("int")
 
-        # Calculate offset:
-        offset = self.emit(
-            ir.mul(idx, e_size, "element_offset", int_ir_type), loc=expr.loc
-        )
+        # Calculate offset, use a shift for power of two element sizes:
+        if element_size == 1:
+            offset = idx
+        elif element_size > 0 and element_size & (element_size - 1) == 0:
+            shift = self.get_const(
+                element_size.bit_length() - 1, "element_shift", int_ir_type
+            )
+            offset = self.emit(
+                ir.Binop(idx, "<<", shift, "element_offset", int_ir_type),
+                loc=expr.loc,
+            )
+        else:
+            e_size = self.get_const(element_size, "element_size", int_ir_type)
+            offset = self.emit(
+                ir.mul(idx, e_size, "element_offset", int_ir_type),
+                loc=expr.loc,
+            )
         offset = self.emit(
             ir.Cast(offset, "element_offset", ir.ptr), loc=expr.loc
         )
@@ -826,15 +990,15 @@ class CodeGenerator:
         # Construct correct const value:
         if isinstance(expr.val, str):
             cval = self.context.pack_string(expr.val)
-            value = self.emit(ir.LiteralData(cval, "strval"))
-            value = self.emit(ir.AddressOf(value, "addr"))
+            value = self.builder.emit(ir.LiteralData(cval, "strval"))
+            value = self.builder.emit(ir.AddressOf(value, "addr"))
         elif isinstance(expr.val, int):  # boolean is a subclass of int!
             # For booleans, use the integer as storage class:
             val = int(expr.val)
-            value = self.emit(ir.Const(val, "cnst", self.get_ir_int()))
+            value = self.get_const(val, "cnst", self.get_ir_int())
         elif isinstance(expr.val, float):
             val = float(expr.val)
-            value = self.emit(ir.Const(val, "cnst", ir.f64))
+            value = self.builder.emit(ir.Const(val, "cnst", ir.f64))
         else:  # pragma: no cover
             raise NotImplementedError(str(expr.val))
         return value
@@ -868,28 +1032,18 @@ class CodeGenerator:
         # }
 
         # Evaluate types from pointer, unsigned, signed to floating point:
-        if isinstance(from_type, ast.PointerType) and isinstance(
-            to_type, ast.PointerType
-        ):
-            return ar
-        elif isinstance(from_type, ast.IntegerType) and isinstance(
-            to_type, ast.PointerType
-        ):
-            return self.emit(ir.Cast(ar, "int2ptr", ir.ptr))
-        elif isinstance(to_type, ast.IntegerType) and isinstance(
-            from_type, ast.PointerType
-        ):
-            ir_to_type = self.get_ir_type(to_type)
-            return self.emit(ir.Cast(ar, "ptr2int", ir_to_type))
-        elif isinstance(
-            from_type, (ast.IntegerType, ast.FloatType)
-        ) and isinstance(to_type, (ast.IntegerType, ast.FloatType)):
-            # Any numeric cast
-            return self.emit(ir.Cast(ar, "cast", self.get_ir_type(to_type)))
-        else:  # pragma: no cover
+        cast_key = (cast_kind(from_type), cast_kind(to_type))
+        if cast_key not in CAST_NAMES:  # pragma: no cover
             raise NotImplementedError(
                 "Cannot cast {} to {}".format(from_type, to_type)
             )
+        cast_name = CAST_NAMES[cast_key]
+        if cast_name is None:
+            # Pointers are pointers, no cast required
+            return ar
+        return self.builder.emit(
+            ir.Cast(ar, cast_name, self.get_ir_type(to_type))
+        )
 
     def gen_function_call(self, expr):
         """ Generate code for a function call """
@@ -904,9 +1058,8 @@ class CodeGenerator:
 
         # Evaluate the arguments:
         args = []
-        for arg_expr, arg_typ in zip(expr.args, ptypes):
+        for arg_expr in expr.args:
             arg_val = self.gen_expr_code(arg_expr, rvalue=True)
-            self.context.equal_types(arg_expr.typ, arg_typ)
             args.append(arg_val)
 
         # Return type will never be an lvalue:
@@ -5,6 +5,23 @@ from .scope import create_top_scope, Scope, SemanticError
 from ...arch.arch_info import Endianness
 from . import astnodes as ast
 
+# Precompiled integer packers per endianness, bit size and signedness:
+_INT_FORMATS = {
+    (8, False): "B",
+    (8, True): "b",
+    (16, False): "H",
+    (16, True): "h",
+    (32, False): "I",
+    (32, True): "i",
+    (64, False): "Q",
+    (64, True): "q",
+}
+_INT_STRUCTS = {
+    (endianness, bits, signed): struct.Struct(prefix + fmt)
+    for endianness, prefix in ((Endianness.LITTLE, "<"), (Endianness.BIG, ">"))
+    for (bits, signed), fmt in _INT_FORMATS.items()
+}
+
 
 class Context:
     """A context is the space where all modules live in.
@@ -151,30 +168,8 @@ class Context:
     def pack_int(self, v, bits=None, signed=True):
         if bits is None:
             bits = self.get_type("int").byte_size * 8
-        if self.arch_info.endianness == Endianness.LITTLE:
-            mapping = {
-                (8, False): "<B",
-                (8, True): "<b",
-                (16, False): "<H",
-                (16, True): "<h",
-                (32, False): "<I",
-                (32, True): "<i",
-                (64, False): "<Q",
-                (64, True): "<q",
-            }
-        else:
-            mapping = {
-                (8, False): ">B",
-                (8, True): ">b",
-                (16, False): ">H",
-                (16, True): ">h",
-                (32, False): ">I",
-                (32, True): ">i",
-                (64, False): ">Q",
-                (64, True): ">q",
-            }
-        fmt = mapping[(bits, signed)]
-        return struct.pack(fmt, v)
+        int_struct = _INT_STRUCTS[(self.arch_info.endianness, bits, signed)]
+        return int_struct.pack(v)
 
     def pack_float(self, v, bits=None):
         if bits is None:
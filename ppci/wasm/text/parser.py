@@ -6,11 +6,12 @@ More or less a python version of this code:
 https://github.com/WebAssembly/wabt/blob/master/src/wast-parser.cc
 """
 
+import itertools
 import logging
+import sys
 
-from collections import defaultdict
 from ...lang.sexpr import parse_sexpr
-from ..opcodes import OPERANDS, OPCODES, ArgType
+from ..opcodes import OPERANDS, OPCODES, ArgType, LOAD_OPS, STORE_OPS
 from ..util import datastring2bytes, make_int, make_float, is_int, PAGE_SIZE
 from .util import default_alignment, log2
 from .tuple_parser import TupleParser, Token
@@ -19,6 +20,16 @@ from .. import components
 
 logger = logging.getLogger("wat")
 
+# Reference spaces of index operands:
+REF_SPACES = {
+    ArgType.LABELIDX: "label",
+    ArgType.LOCALIDX: "local",
+    ArgType.GLOBALIDX: "global",
+    ArgType.FUNCIDX: "func",
+    ArgType.TYPEIDX: "type",
+    ArgType.TABLEIDX: "table",
+}
+
 
 def load_tuple(module, t):
     """ Load contents of tuple t into module """
@@ -27,35 +38,57 @@ def load_tuple(module, t):
 
     loader = WatTupleLoader(module)
 
-    if any(isinstance(e, components.Definition) for e in t):
-        if not all(isinstance(e, components.Definition) for e in t):
-            raise TypeError("All elements must be wasm components")
+    has_definitions = has_other = False
+    for e in t:
+        if isinstance(e, components.Definition):
+            has_definitions = True
+        else:
+            has_other = True
+    if has_definitions and has_other:
+        raise TypeError("All elements must be wasm components")
 
+    if has_definitions:
         for e in t:
             loader.add_definition(e)
         module.id = None
         module.definitions = loader.gather_definitions()
     else:
         # Parse nested strings at top level:
-        t2 = []
-        for e in t:
-            if isinstance(e, str) and e.startswith("("):
-                e = parse_sexpr(e)
-            t2.append(e)
-        t2 = tuple(t2)
-
+        t2 = [
+            parse_sexpr(e) if isinstance(e, str) and e.startswith("(") else e
+            for e in t
+        ]
         loader.load_module(t2)
 
 
 class WatTupleLoader(TupleParser):
     def __init__(self, module):
         self.module = module
-        self.definitions = defaultdict(list)
+        self.definitions = {name: [] for name in components.SECTION_IDS}
         self._type_hash = {}  # (params, results) -> ref
 
         self.resolve_backlog = []
         self.func_backlog = []
 
+        self._section_loaders = {
+            "type": self.load_type,
+            "data": self.load_data,
+            "elem": self.load_elem,
+            "export": self.load_export,
+            "func": self.load_func,
+            "global": self.load_global,
+            "import": self.load_import,
+            "memory": self.load_memory,
+            "start": self.load_start,
+            "table": self.load_table,
+        }
+        self._import_info_parsers = {
+            "func": self._parse_func_import_info,
+            "table": self._parse_table_import_info,
+            "memory": self._parse_memory_import_info,
+            "global": self._parse_global_import_info,
+        }
+
     def load_module(self, t):
         """ Load a module from a tuple """
         self._feed(t)
@@ -71,28 +104,10 @@ class WatTupleLoader(TupleParser):
         while self.match(Token.LPAR):
             self.expect(Token.LPAR)
             kind = self.take()
-            if kind == "type":
-                self.load_type()
-            elif kind == "data":
-                self.load_data()
-            elif kind == "elem":
-                self.load_elem()
-            elif kind == "export":
-                self.load_export()
-            elif kind == "func":
-                self.load_func()
-            elif kind == "global":
-                self.load_global()
-            elif kind == "import":
-                self.load_import()
-            elif kind == "memory":
-                self.load_memory()
-            elif kind == "start":
-                self.load_start()
-            elif kind == "table":
-                self.load_table()
-            else:  # pragma: no cover
+            loader = self._section_loaders.get(kind)
+            if loader is None:  # pragma: no cover
                 raise NotImplementedError(kind)
+            loader()
             self.expect(Token.RPAR)
 
         self.expect(Token.RPAR)
@@ -144,11 +159,11 @@ class WatTupleLoader(TupleParser):
 
     def gather_definitions(self):
         """ Take all definitions by section id order: """
-        definitions = []
-        for name in components.SECTION_IDS:
-            for definition in self.definitions[name]:
-                definitions.append(definition)
-        return definitions
+        return list(
+            itertools.chain.from_iterable(
+                self.definitions[name] for name in components.SECTION_IDS
+            )
+        )
 
     def add_definition(self, definition):
         space = definition.__name__
@@ -170,6 +185,11 @@ class WatTupleLoader(TupleParser):
         # it is used
         self.add_definition(components.Type(id, params, results))
 
+        # But later inline signatures can reuse this type:
+        key = tuple(params), tuple(results)
+        if key not in self._type_hash:
+            self._type_hash[key] = self._make_ref("type", id)
+
     def _parse_optional_id(self, default=None):
         if self._at_id():
             id = self.take()
@@ -244,16 +264,20 @@ class WatTupleLoader(TupleParser):
     def _parse_type_bound_value_list(self, kind):
         """ Parse thing like (locals i32) (locals $foo i32) """
         params = []
-        while self.munch(Token.LPAR, kind):
-            if not self.match(Token.RPAR):
+        append = params.append
+        match, take = self.match, self.take
+        LPAR, RPAR = Token.LPAR, Token.RPAR
+        while self.munch(LPAR, kind):
+            if not match(RPAR):
                 if self._at_id():  # (param $id i32)
-                    params.append((self.take(), self.take()))
+                    append((take(), take()))
                 else:
                     # anonymous (param i32 i32 i32)
-                    while not self.match(Token.RPAR):
-                        p = self.take()
-                        params.append((len(params), p))
-            self.expect(Token.RPAR)
+                    index = len(params)
+                    while not match(RPAR):
+                        append((index, take()))
+                        index += 1
+            self.expect(RPAR)
         return params
 
     def _parse_result_list(self):
@@ -271,26 +295,32 @@ class WatTupleLoader(TupleParser):
         self.expect(Token.LPAR)
         kind = self.take()
         id = self._parse_optional_id(default=self.gen_id(kind))
-        if kind == "func":
-            ref = self._parse_type_use()
-            info = (ref,)
-        elif kind == "table":
-            min, max = self.parse_limits()
-            table_kind = self.take()
-            assert table_kind == "funcref"
-            info = (table_kind, min, max)
-        elif kind == "memory":
-            min, max = self.parse_limits()
-            info = (min, max)
-        elif kind == "global":
-            typ, mutable = self.parse_global_type()
-            info = (typ, mutable)
-        else:  # pragma: no cover
+        info_parser = self._import_info_parsers.get(kind)
+        if info_parser is None:  # pragma: no cover
             raise NotImplementedError(kind)
+        info = info_parser()
 
         self.expect(Token.RPAR)
         self.add_definition(components.Import(modname, name, kind, id, info))
 
+    def _parse_func_import_info(self):
+        ref = self._parse_type_use()
+        return (ref,)
+
+    def _parse_table_import_info(self):
+        min, max = self.parse_limits()
+        table_kind = self.take()
+        assert table_kind == "funcref"
+        return (table_kind, min, max)
+
+    def _parse_memory_import_info(self):
+        min, max = self.parse_limits()
+        return (min, max)
+
+    def _parse_global_import_info(self):
+        typ, mutable = self.parse_global_type()
+        return (typ, mutable)
+
     def load_export(self):
         """ Parse a toplevel export """
         name = self.take()
@@ -382,9 +412,8 @@ class WatTupleLoader(TupleParser):
         elif self.munch(Token.LPAR, "data"):  # Inline data
             data = self.parse_data_blobs()
             self.expect(Token.RPAR)
-            max = round_up(len(data), PAGE_SIZE) // PAGE_SIZE
-            assert len(data) <= max * PAGE_SIZE, "TODO: round upward"
-            min = max
+            # Exactly enough pages to hold the data:
+            min = max = -(-len(data) // PAGE_SIZE)
             self.add_definition(components.Memory(id, min, max))
             offset = [components.Instruction("i32.const", 0)]
             memory_ref = self._make_ref("memory", id)
@@ -394,9 +423,9 @@ class WatTupleLoader(TupleParser):
             self.add_definition(components.Memory(id, min, max))
 
     def parse_limits(self):
-        if is_int(self._lookahead(1)[0]):
+        if is_int(self._peek()):
             min = make_int(self.take())
-            if is_int(self._lookahead(1)[0]):
+            if is_int(self._peek()):
                 max = make_int(self.take())
             else:
                 max = None
@@ -439,7 +468,7 @@ class WatTupleLoader(TupleParser):
         self.add_definition(components.Data(ref, offset, data))
 
     def parse_data_blobs(self):
-        data = bytearray()
+        blobs = []
         while not self.match(Token.RPAR):
             txt = self.take()
             if isinstance(txt, bytes):
@@ -447,9 +476,8 @@ class WatTupleLoader(TupleParser):
             else:
                 assert isinstance(txt, str)
                 blob = datastring2bytes(txt)
-            data.extend(blob)
-        data = bytes(data)
-        return data
+            blobs.append(blob)
+        return b"".join(blobs)
 
     def parse_offset_expression(self):
         in_offset = self.munch(Token.LPAR, "offset")
@@ -484,25 +512,42 @@ class WatTupleLoader(TupleParser):
         return self._parse_type_bound_value_list("local")
 
     def _load_instruction_list(self):
-        """ Load a list of instructions """
+        """Load a list of instructions.
+
+        Folded instructions contain nested instruction lists. Instead of
+        recursing, keep a stack of continuations. When a nested list ends,
+        the innermost continuation completes the folded instruction, and
+        may return a new continuation for a following nested list.
+        """
         instructions = []
-        while self.at_instruction():
-            instructions.extend(self._load_instruction())
+        continuations = []
+        while True:
+            if self.at_instruction():
+                continuation = self._load_instruction(instructions)
+            elif continuations:
+                method, value = continuations.pop()
+                continuation = method(instructions, value)
+            else:
+                break
+
+            if continuation:
+                continuations.append(continuation)
         return instructions
 
-    def _load_instruction(self):
-        """Load a single (maybe nested) instruction.
+    def _load_instruction(self, instructions):
+        """Load a single instruction into the given list.
 
         For nesting syntax, please refer here:
         https://webassembly.github.io/spec/core/text/instructions.html#folded-instructions
 
-        Note that this returns a list of instructions.
+        When the instruction is folded, this returns a continuation
+        to be invoked after the nested instructions are loaded.
         """
 
-        instructions = []
         # We can have instructions without parenthesis! OMG
         is_braced = self.munch(Token.LPAR)
-        opcode = self.take()
+        # Share a single string object for each opcode among instructions:
+        opcode = sys.intern(self.take())
 
         if opcode == "if":
             block_id = self._parse_optional_id()
@@ -514,26 +559,8 @@ class WatTupleLoader(TupleParser):
 
             if is_braced:
                 # Nested/folded syntax stuff
-                # 'then' is no opcode, solely syntactic sugar.
-
                 # First is the condition:
-                instructions.extend(self._load_instruction_list())
-                instructions.append(if_instruction)
-
-                # A nested then:
-                self.expect(Token.LPAR, "then")
-                instructions.extend(self._load_instruction_list())
-                self.expect(Token.RPAR)
-
-                # Optional nested 'else':
-                if self.munch(Token.LPAR, "else"):
-                    instructions.append(components.Instruction("else"))
-                    instructions.extend(self._load_instruction_list())
-                    self.expect(Token.RPAR)
-
-                # Add implicit end:
-                self.block_stack.pop()
-                instructions.append(components.Instruction("end"))
+                return (self._finish_if_condition, if_instruction)
             else:
                 instructions.append(if_instruction)
 
@@ -548,11 +575,7 @@ class WatTupleLoader(TupleParser):
 
             if is_braced:
                 # Nested instructions
-                instructions.extend(self._load_instruction_list())
-
-                # Add implicit end:
-                self.block_stack.pop()
-                instructions.append(components.Instruction("end"))
+                return (self._finish_folded_block, None)
 
         elif opcode == "else":
             block_id = self._parse_optional_id()
@@ -578,7 +601,7 @@ class WatTupleLoader(TupleParser):
 
             if is_braced:
                 # Nested instruction!
-                instructions.extend(self._load_instruction_list())
+                return (self._finish_folded_instruction, i)
 
             instructions.append(i)
 
@@ -586,7 +609,40 @@ class WatTupleLoader(TupleParser):
         if is_braced:
             self.expect(Token.RPAR)
 
-        return instructions
+    def _finish_if_condition(self, instructions, if_instruction):
+        """ The condition of a folded if is loaded, continue with then. """
+        instructions.append(if_instruction)
+
+        # A nested then, 'then' is no opcode, solely syntactic sugar:
+        self.expect(Token.LPAR, "then")
+        return (self._finish_if_then, None)
+
+    def _finish_if_then(self, instructions, _):
+        """ The then part of a folded if is loaded. """
+        self.expect(Token.RPAR)
+
+        # Optional nested 'else':
+        if self.munch(Token.LPAR, "else"):
+            instructions.append(components.Instruction("else"))
+            return (self._finish_if_else, None)
+
+        return self._finish_folded_block(instructions, None)
+
+    def _finish_if_else(self, instructions, _):
+        """ The else part of a folded if is loaded. """
+        self.expect(Token.RPAR)
+        return self._finish_folded_block(instructions, None)
+
+    def _finish_folded_block(self, instructions, _):
+        """ Add implicit end to a folded block, loop or if. """
+        self.block_stack.pop()
+        instructions.append(components.Instruction("end"))
+        self.expect(Token.RPAR)
+
+    def _finish_folded_instruction(self, instructions, instruction):
+        """ The operands of a folded instruction are loaded. """
+        instructions.append(instruction)
+        self.expect(Token.RPAR)
 
     def _load_block_type(self):
         """ Get the block type. """
@@ -610,8 +666,13 @@ class WatTupleLoader(TupleParser):
 
     def _gather_opcode_arguments(self, opcode):
         """ Gather the arguments to a specific opcode. """
+        operands = OPERANDS[opcode]
+        if not operands:
+            # Most instructions have no arguments at all
+            return ()
+
         # Process any special case arguments:
-        if ".load" in opcode or ".store" in opcode:
+        if opcode in LOAD_OPS or opcode in STORE_OPS:
             args = self._parse_load_store_arguments(opcode)
         elif opcode == "call_indirect":
             type_ref = self._parse_type_use()
@@ -619,23 +680,11 @@ class WatTupleLoader(TupleParser):
             args = (type_ref, table_ref)
             # TODO: compare unbound func signature with type?
         else:
-            operands = OPERANDS[opcode]
-
             args = []
             for op in operands:
                 # assert not self.match(Token.LPAR)
-                if op == ArgType.LABELIDX:
-                    arg = self._parse_ref("label")
-                elif op == ArgType.LOCALIDX:
-                    arg = self._parse_ref("local")
-                elif op == ArgType.GLOBALIDX:
-                    arg = self._parse_ref("global")
-                elif op == ArgType.FUNCIDX:
-                    arg = self._parse_ref("func")
-                elif op == ArgType.TYPEIDX:
-                    arg = self._parse_ref("type")
-                elif op == ArgType.TABLEIDX:
-                    arg = self._parse_ref("table")
+                if op in REF_SPACES:
+                    arg = self._parse_ref(REF_SPACES[op])
                 elif op == ArgType.I32:
                     arg = make_int(self.take(), bits=32)
                 elif op == ArgType.I64:
@@ -688,7 +737,7 @@ class WatTupleLoader(TupleParser):
     def _parse_keyword_arguments(self):
         """ Parse some arguments of shape key=value. """
         attributes = {}
-        while is_kwarg(self._lookahead(1)[0]):
+        while is_kwarg(self._peek()):
             arg = self.take()
             assert is_kwarg(arg)
             key, value = arg.split("=", 1)
@@ -706,25 +755,26 @@ class WatTupleLoader(TupleParser):
 
     def _parse_inline_export(self, kind, obj_name):
         ref = self._make_ref(kind, obj_name)
-        while self.match(Token.LPAR, "export"):
-            self.expect(Token.LPAR, "export")
-            name = self.take()
-            self.expect(Token.RPAR)
-            self.add_definition(components.Export(name, kind, ref))
+        munch, take, expect = self.munch, self.take, self.expect
+        add_definition = self.add_definition
+        Export = components.Export
+        while munch(Token.LPAR, "export"):
+            name = take()
+            expect(Token.RPAR)
+            add_definition(Export(name, kind, ref))
 
     def at_instruction(self):
-        if self.match(Token.LPAR):
-            la = self._lookahead(2)[1]
-        else:
-            la = self._lookahead(1)[0]
+        la = self._peek()
+        if la is Token.LPAR:
+            la = self._peek(1)
         return la in OPCODES
 
     def _at_id(self):
-        x = self._lookahead(1)[0]
+        x = self._peek()
         return is_id(x)
 
     def _at_ref(self):
-        x = self._lookahead(1)[0]
+        x = self._peek()
         return is_ref(x)
 
 
@@ -747,13 +797,5 @@ def is_kwarg(x):
     return isinstance(x, str) and "=" in x
 
 
-def round_up(value, multiple):
-    rest = value % multiple
-    if rest:
-        return value + (multiple - rest)
-    else:
-        return value
-
-
 def str2int(x):
     return int(x, 16) if x.startswith("0x") else int(x)
@@ -3,6 +3,7 @@
 """
 
 import enum
+from collections import deque
 
 
 class TupleParser:
@@ -11,30 +12,35 @@ class TupleParser:
     # match helper section:
     def _feed(self, t):
         self._nxt_func = self._tuple_generator(t)
-        self._nxt = []
+        self._nxt = deque()
 
     def _tuple_generator(self, t):
-        for e in self._tuple_generator_inner(t):
-            yield e
-        yield Token.EOF
+        """ Lazily flatten nested tuples into a token stream.
 
-    def _tuple_generator_inner(self, t):
+        An explicit stack of iterators is used, so that a token does not
+        have to pass a generator for each level of nesting.
+        """
         yield Token.LPAR
-        for e in t:
-            if isinstance(e, tuple):
-                for e2 in self._tuple_generator_inner(e):
-                    yield e2
+        stack = [iter(t)]
+        while stack:
+            for e in stack[-1]:
+                if isinstance(e, tuple):
+                    yield Token.LPAR
+                    stack.append(iter(e))
+                    break
+                else:
+                    yield e
             else:
-                yield e
-        yield Token.RPAR
+                stack.pop()
+                yield Token.RPAR
+        yield Token.EOF
 
-    def _lookahead(self, amount: int):
-        """ Return some lookahead tokens """
-        assert amount > 0
-        while len(self._nxt) < amount:
-            nxt = next(self._nxt_func, Token.EOF)
-            self._nxt.append(nxt)
-        return tuple(self._nxt[:amount])
+    def _peek(self, index=0):
+        """ Return a single lookahead token, without building a tuple """
+        nxt = self._nxt
+        while len(nxt) <= index:
+            nxt.append(next(self._nxt_func, Token.EOF))
+        return nxt[index]
 
     def expect(self, *args):
         """ Check if tokens ahead match the given sequence """
@@ -53,18 +59,19 @@ class TupleParser:
 
     def match(self, *args):
         """ Check if the given tokens are ahead """
-        peek = self._lookahead(len(args))
-        if peek == args:
-            return True
-        else:
-            return False
+        nxt = self._nxt
+        while len(nxt) < len(args):
+            nxt.append(next(self._nxt_func, Token.EOF))
+        for arg, token in zip(args, nxt):
+            if arg != token:
+                return False
+        return True
 
     def take(self):
         """ Take the next token """
-        if not self._nxt:
-            nxt = next(self._nxt_func, Token.EOF)
-            self._nxt.append(nxt)
-        return self._nxt.pop(0)
+        if self._nxt:
+            return self._nxt.popleft()
+        return next(self._nxt_func, Token.EOF)
 
 
 class Token(enum.Enum):
@@ -6,6 +6,7 @@ from ppci.lang.c3 import astnodes
 from ppci.arch.example import ExampleArch
 from ppci.common import DiagnosticsManager, CompilerError
 from ppci.irutils import verify_module
+from ppci import ir
 
 
 class LexerTestCase(unittest.TestCase):
@@ -716,6 +717,105 @@ class ExpressionTestCase(BuildTestCaseBase):
         """
         self.expect_errors(snippet, [6])
 
+    def test_constants_reused_within_block(self):
+        """ Check that equal constants are only emitted once per block """
+        snippet = """
+         module testconstreuse;
+         function void t(int x)
+         {
+            var int[10] a;
+            a[1] = 2;
+            a[2] = 2;
+            if (x > 2)
+            {
+              a[3] = 2;
+            }
+         }
+        """
+        ir_module = self.build(snippet)
+        verify_module(ir_module)
+        for block in ir_module.functions[0]:
+            values = [
+                (i.value, i.ty) for i in block if isinstance(i, ir.Const)]
+            self.assertEqual(len(set(values)), len(values))
+
+    def test_index_with_power_of_two_element_size(self):
+        """ Check that indexing uses a shift instead of a multiply """
+        snippet = """
+         module testindexshift;
+         function void t(int x)
+         {
+            var int[10] a;
+            var byte[10] b;
+            a[x] = 2;
+            b[x] = 2;
+         }
+        """
+        ir_module = self.build(snippet)
+        verify_module(ir_module)
+        binops = ir_module.functions[0].get_instructions_of_type(ir.Binop)
+        operations = [i.operation for i in binops]
+        self.assertNotIn('*', operations)
+        self.assertIn('<<', operations)
+
+    def test_zero_offset_addressing(self):
+        """ Check that no address arithmetic is done for zero offsets """
+        snippet = """
+         module testzerooffset;
+         type struct { int x; int y; } point_t;
+         function void t()
+         {
+            var int[10] a;
+            var point_t p;
+            a[0] = 2;
+            p.x = 3;
+         }
+        """
+        ir_module = self.build(snippet)
+        verify_module(ir_module)
+        binops = ir_module.functions[0].get_instructions_of_type(ir.Binop)
+        self.assertEqual([], list(binops))
+
+    def test_parameters_without_memory(self):
+        """ Only parameters which are assigned or referenced live in memory
+        """
+        self.builder = C3Builder(self.diag, ExampleArch().info, debug=False)
+        snippet = """
+         module testparams;
+         type struct { int* x; int y; } s_t;
+         function int t(int a, int b, int c, int d)
+         {
+            var s_t s = {.x = &d, .y = a};
+            b = b + 1;
+            return a + b + *(&c);
+         }
+        """
+        ir_module = self.build(snippet)
+        verify_module(ir_module)
+        allocs = ir_module.functions[0].get_instructions_of_type(ir.Alloc)
+        self.assertEqual(
+            ['var_b', 'var_c', 'var_d', 'var_s'],
+            sorted(alloc.name for alloc in allocs))
+
+    def test_parameters_debug_variables(self):
+        """ With debug info, parameters are debug variables in memory """
+        snippet = """
+         module testparams;
+         function int f(int a, int b)
+         {
+            var int c = a + b;
+            return c;
+         }
+        """
+        ir_module = self.build(snippet)
+        ir_function = ir_module.functions[0]
+        debug_db = self.builder.codegen.debug_db
+        self.assertEqual(
+            ['a', 'b', 'c'],
+            [v.name for v in debug_db.get(ir_function).variables])
+        allocs = list(ir_function.get_instructions_of_type(ir.Alloc))
+        self.assertEqual(3, len(allocs))
+
 
 class StatementTestCase(BuildTestCaseBase):
     """ Testcase for statements """
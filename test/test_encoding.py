@@ -32,6 +32,21 @@ class TokenTestCase(unittest.TestCase):
         my_token.field2 = -3
         self.assertEqual(0x0d10, my_token.bit_value)
 
+    def test_field_get_and_overflow(self):
+        info = type('Info', (object,), {'size': 16})
+        members = {'field1': bit_range(4, 8), 'Info': info}
+        MyToken = type('MyToken', (Token,), members)
+        my_token = MyToken(0xabcd)
+        self.assertEqual(0xc, my_token.field1)
+        my_token.field1 = 0x3
+        self.assertEqual(0xab3d, my_token.bit_value)
+        with self.assertRaises(ValueError):
+            my_token.field1 = 16
+        my_token.field1 = -16
+        self.assertEqual(0x0, my_token.field1)
+        with self.assertRaises(ValueError):
+            my_token.field1 = -17
+
 
 class SyntaxTestCase(unittest.TestCase):
     def test_lower_case(self):
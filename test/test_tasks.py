@@ -1,8 +1,66 @@
 import os
 import unittest
 import tempfile
+import time
+from contextlib import contextmanager
 
 from ppci.build.tasks import TaskRunner, TaskError, Project, Target, Task
+from ppci.build.tasks import register_task, task_map
+
+
+@contextmanager
+def registered_tasks(*classes):
+    """ Register task classes for the duration of a test """
+    for cls in classes:
+        register_task(cls)
+    try:
+        yield
+    finally:
+        for cls in classes:
+            del task_map[cls.__name__.lower()[:-4]]
+
+
+class WriteFileTask(Task):
+    """ Task which creates an empty file """
+    def run(self):
+        with open(self.relpath(self.get_argument('output')), 'w'):
+            pass
+
+
+class GlobTask(Task):
+    """ Task which records the files matching a pattern """
+    found = []
+
+    def run(self):
+        files = self.open_file_set(self.get_argument('sources'))
+        GlobTask.found.append([os.path.basename(f) for f in files])
+
+
+class RecordTask(Task):
+    """ Task which records when it starts and ends """
+    events = []
+
+    def run(self):
+        RecordTask.events.append(('start', self.target.name))
+        time.sleep(0.01)
+        RecordTask.events.append(('end', self.target.name))
+
+
+class FailTask(Task):
+    """ Task which always fails """
+    def run(self):
+        raise TaskError('Failed on purpose')
+
+
+class CountingTask(Task):
+    """ Task which counts its runs, used to test incremental builds """
+    runs = 0
+
+    def inputs(self):
+        return [self.relpath(self.get_argument('source'))]
+
+    def run(self):
+        CountingTask.runs += 1
 
 
 class TaskTestCase(unittest.TestCase):
@@ -31,6 +89,17 @@ class TaskTestCase(unittest.TestCase):
         with self.assertRaisesRegex(TaskError, "Dependency loop"):
             proj.check_target(t1.name)
 
+    def test_diamond_is_no_loop(self):
+        """ Test that a target reachable via two paths is not a loop """
+        proj = Project('testproject')
+        for name in ['t1', 't2', 't3', 't4']:
+            proj.add_target(Target(name, proj))
+        proj.get_target('t1').add_dependency('t2')
+        proj.get_target('t1').add_dependency('t3')
+        proj.get_target('t2').add_dependency('t4')
+        proj.get_target('t3').add_dependency('t4')
+        proj.check_target('t1')
+
     def test_targets_same_name(self):
         """ Test two target with the same name """
         proj = Project('testproject')
@@ -50,6 +119,115 @@ class TaskTestCase(unittest.TestCase):
         runner = TaskRunner()
         runner.run(proj, ['t1'])
 
+    def test_dependencies(self):
+        """ Test transitive dependencies, also after adding a dependency """
+        proj = Project('testproject')
+        for name in ['t1', 't2', 't3', 't4']:
+            proj.add_target(Target(name, proj))
+        proj.get_target('t1').add_dependency('t2')
+        proj.get_target('t1').add_dependency('t3')
+        proj.get_target('t2').add_dependency('t3')
+        self.assertEqual({'t2', 't3'}, proj.dependencies('t1'))
+        proj.get_target('t3').add_dependency('t4')
+        self.assertEqual({'t2', 't3', 't4'}, proj.dependencies('t1'))
+
+    def test_target_without_project(self):
+        target = Target('t1', None)
+        target.add_dependency('t2')
+        self.assertEqual({'t2'}, target.dependencies)
+
+    def test_toposort(self):
+        """ Test that targets are ordered after their dependencies """
+        proj = Project('testproject')
+        for name in ['a', 'b', 'c', 'd']:
+            proj.add_target(Target(name, proj))
+        proj.get_target('a').add_dependency('d')
+        proj.get_target('b').add_dependency('a')
+        proj.get_target('c').add_dependency('d')
+        self.assertEqual(
+            ['d', 'a', 'b', 'c'], proj.toposort(['a', 'b', 'c', 'd']))
+
+    def test_levels(self):
+        """ Test grouping of targets which can run in parallel """
+        proj = Project('testproject')
+        for name in ['a', 'b', 'c', 'd']:
+            proj.add_target(Target(name, proj))
+        proj.get_target('a').add_dependency('d')
+        proj.get_target('b').add_dependency('a')
+        proj.get_target('c').add_dependency('d')
+        self.assertEqual(
+            [['d'], ['a', 'c'], ['b']], proj.levels(['a', 'b', 'c', 'd']))
+        runner = TaskRunner(concurrency=2)
+        runner.run(proj, ['b', 'c'])
+
+    def test_parallel_order(self):
+        """ Test that a level only starts when the previous one is done """
+        proj = Project('testproject')
+        for name in ['a', 'b', 'c', 'd']:
+            target = Target(name, proj)
+            target.add_task(('record', {}))
+            proj.add_target(target)
+        proj.get_target('a').add_dependency('d')
+        proj.get_target('b').add_dependency('a')
+        proj.get_target('c').add_dependency('d')
+        RecordTask.events = []
+        with registered_tasks(RecordTask):
+            TaskRunner(concurrency=2).run(proj, ['b', 'c'])
+        events = RecordTask.events
+        self.assertEqual(8, len(events))
+        for name, dep in [('a', 'd'), ('b', 'a'), ('b', 'c'), ('c', 'd')]:
+            self.assertLess(
+                events.index(('end', dep)), events.index(('start', name)))
+
+    def test_parallel_failure(self):
+        """ Test that a failing task stops a parallel run """
+        proj = Project('testproject')
+        for name, task in [('a', 'fail'), ('b', 'record'), ('c', 'record')]:
+            target = Target(name, proj)
+            target.add_task((task, {}))
+            proj.add_target(target)
+        proj.get_target('c').add_dependency('a')
+        proj.get_target('c').add_dependency('b')
+        RecordTask.events = []
+        with registered_tasks(RecordTask, FailTask):
+            with self.assertRaisesRegex(TaskError, 'on purpose'):
+                TaskRunner(concurrency=2).run(proj, ['c'])
+        self.assertNotIn(('start', 'c'), RecordTask.events)
+
+    def test_incremental(self):
+        """ Test that a task with unchanged inputs is skipped """
+        basedir = tempfile.mkdtemp()
+        source = os.path.join(basedir, 'a.txt')
+        with open(source, 'w') as f:
+            f.write('a')
+        proj = Project('testproject')
+        proj.set_property('basedir', basedir)
+        target = Target('t1', proj)
+        target.add_task(('counting', {'source': 'a.txt'}))
+        proj.add_target(target)
+        runner = TaskRunner(incremental=True)
+        CountingTask.runs = 0
+        with registered_tasks(CountingTask):
+            runner.run(proj, ['t1'])
+            runner.run(proj, ['t1'])
+            self.assertEqual(1, CountingTask.runs)
+            with open(source, 'w') as f:
+                f.write('ab')
+            runner.run(proj, ['t1'])
+            self.assertEqual(2, CountingTask.runs)
+            TaskRunner().run(proj, ['t1'])
+            self.assertEqual(3, CountingTask.runs)
+
+    def test_expand_macros(self):
+        proj = Project('testproject')
+        proj.set_property('basedir', '/base')
+        proj.set_property('src', '${basedir}/src')
+        self.assertEqual(
+            '/base/src/a.c3;/base/b.c3',
+            proj.expand_macros('${src}/a.c3;${basedir}/b.c3'))
+        with self.assertRaisesRegex(TaskError, 'not found'):
+            proj.expand_macros('${nope}')
+
     def test_ensure_path(self):
         empty_dir = tempfile.mkdtemp()
         txt_filename = os.path.join('a', 'b', 'c.txt')
@@ -66,6 +244,28 @@ class TaskTestCase(unittest.TestCase):
         task = Task(target, None)
         with self.assertRaisesRegex(TaskError, 'not found'):
             task.open_file_set('*.asm')
+        asm_filename = os.path.join(empty_dir, 'a.asm')
+        with open(asm_filename, 'w'):
+            pass
+        task = Task(target, None)
+        self.assertEqual([asm_filename], task.open_file_set('*.asm'))
+
+    def test_open_fileset_sees_new_files(self):
+        """ Test that files created by earlier tasks in a run are found """
+        basedir = tempfile.mkdtemp()
+        proj = Project('testproject')
+        proj.set_property('basedir', basedir)
+        target = Target('t1', proj)
+        target.add_task(('writefile', {'output': 'a.oj'}))
+        target.add_task(('glob', {'sources': '*.oj'}))
+        target.add_task(('writefile', {'output': 'b.oj'}))
+        target.add_task(('glob', {'sources': '*.oj'}))
+        proj.add_target(target)
+        GlobTask.found = []
+        with registered_tasks(WriteFileTask, GlobTask):
+            TaskRunner().run(proj, ['t1'])
+        self.assertEqual(
+            [['a.oj'], ['a.oj', 'b.oj']], [sorted(f) for f in GlobTask.found])
 
 
 if __name__ == '__main__':
@@ -168,6 +168,31 @@ def test_module_id():
     assert len(m3.definitions) == 2  # Type and func
 
 
+def test_deeply_folded_instructions():
+    # Deeper than the recursion limit:
+    expr = ('i32.const', 0)
+    for _ in range(3000):
+        expr = ('i32.add', ('i32.const', 1), expr)
+    m = wasm.Module(('module', ('func', ('result', 'i32'), expr)))
+    instructions = m.definitions[-1].instructions
+    assert len(instructions) == 6001
+    assert instructions[0].opcode == 'i32.const'
+    assert instructions[-1].opcode == 'i32.add'
+
+
+def test_reuse_type_for_inline_signature():
+    m = wasm.Module(
+        '(module (type $t (func (param i32) (result i32)))'
+        ' (func (param i32) (result i32) (local.get 0))'
+        ' (func (param i32) (result i32) (local.get 0)))')
+    types = [d for d in m.definitions if isinstance(d, wasm.Type)]
+    assert len(types) == 1
+    funcs = [d for d in m.definitions if isinstance(d, wasm.Func)]
+    assert [f.ref.index for f in funcs] == [0, 0]
+
+
 if __name__ == '__main__':
     test_module1()
     test_module_id()
+    test_deeply_folded_instructions()
+    test_reuse_type_for_inline_signature()